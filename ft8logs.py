@@ -1,5 +1,5 @@
 # Backend (app.py) - refactored for Pythonic style
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
+from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, Response
 from threading import Thread, Lock
 import socket
 import re
@@ -13,6 +13,7 @@ from pyhamtools import LookupLib, Callinfo
 from werkzeug.utils import secure_filename
 import adif_io
 import signal
+import struct
 import sys
 
 app = Flask(__name__)
@@ -476,15 +477,152 @@ def frequency_to_band(frequency_khz):
 
         
         
-#log in adif format for wsjt-x like processing        
-def log_adi_entry(entry):
-    """Append WSJT-X compatible ADIF entry to log file."""
-    directory = './logs/'
-    file_path = './logs/wsjtx_log.adi'
-
-    # Ensure the directory exists
-    os.makedirs(directory, exist_ok=True)
+#log in adif format for wsjt-x like processing
+ADIF_LOG_DIR    = './logs/'
+ADIF_LOG_FILE   = './logs/wsjtx_log.adi'
+ADIF_LOG_HEADER = "WSJT-X ADIF Export<eoh>\n"
+ADIF_ROTATE     = (os.getenv('ADIF_ROTATE', "day"))                # rotate adif log: "day", "size" or "No"
+ADIF_MAX_BYTES  = int(os.getenv('ADIF_MAX_MB', 100)) * 1024 * 1024  # size limit for "size" rotation
+
+# Sidecar index: one fixed-size record (unix time, byte offset, byte length) per ADIF record
+ADIF_INDEX_RECORD = struct.Struct('<qqq')
+ADIF_EXPORT_CHUNK = 64 * 1024
+
+adif_log_lock = Lock()     # Lock for writing, rotating and snapshotting the ADIF log
+adif_log_state = {}        # Cached size and first record day of the active ADIF log
+
+ADIF_RECORD_DATE = re.compile(rb'<QSO_DATE:8>(\d{8})', re.IGNORECASE)
+ADIF_RECORD_TIME = re.compile(rb'<TIME_ON:6>(\d{6})', re.IGNORECASE)
+ADIF_RECORD_EOR = re.compile(rb'<EOR>', re.IGNORECASE)
+
+def adi_index_path(file_path):
+    """Return the path of the sidecar index for an ADIF log file."""
+    return file_path + '.idx'
+
+def read_adi_index_entry(index_file, position):
+    """Read the (timestamp, offset, length) entry at the given position of an open index."""
+    index_file.seek(position * ADIF_INDEX_RECORD.size)
+    return ADIF_INDEX_RECORD.unpack(index_file.read(ADIF_INDEX_RECORD.size))
+
+def rebuild_adi_index(file_path):
+    """Scan an ADIF log line by line and write its sidecar index from scratch."""
+    entries = 0
+    skipped = 0
+    # Build into a temp file so an interrupted rebuild never leaves a valid-looking index
+    temp_path = adi_index_path(file_path) + '.tmp'
+    with open(file_path, 'rb') as log_file, open(temp_path, 'wb') as index_file:
+        offset = log_file.tell()
+        record_start = None
+        qso_date = time_on = None
+        for line in log_file:
+            if record_start is None and b'<' in line:
+                record_start = offset
+            offset += len(line)
+            if b'<eoh>' in line.lower():
+                # Everything up to the end of header is not a record
+                record_start = None
+                continue
+            date_match = ADIF_RECORD_DATE.search(line)
+            if date_match:
+                qso_date = date_match.group(1)
+            time_match = ADIF_RECORD_TIME.search(line)
+            if time_match:
+                time_on = time_match.group(1)
+            if ADIF_RECORD_EOR.search(line):
+                if record_start is not None and qso_date and time_on:
+                    try:
+                        timestamp = datet.strptime((qso_date + time_on).decode('ascii'), "%Y%m%d%H%M%S")
+                    except ValueError as e:
+                        debug_print(f"Skipping ADIF record at byte {record_start} of {file_path}: {str(e)}")
+                        skipped += 1
+                    else:
+                        unix_time = int(pytz.utc.localize(timestamp).timestamp())
+                        index_file.write(ADIF_INDEX_RECORD.pack(unix_time, record_start, offset - record_start))
+                        entries += 1
+                record_start = None
+                qso_date = time_on = None
+    os.replace(temp_path, adi_index_path(file_path))
+    debug_print(f"Rebuilt ADIF index for {file_path} with {entries} records ({skipped} skipped)")
+
+def load_adi_log_state():
+    """Initialise the active ADIF log state, rebuilding a missing or stale index."""
+    os.makedirs(ADIF_LOG_DIR, exist_ok=True)
+    if not os.path.exists(ADIF_LOG_FILE):
+        with open(ADIF_LOG_FILE, 'wb') as log_file:
+            log_file.write(ADIF_LOG_HEADER.encode('utf-8'))
+
+    size = os.path.getsize(ADIF_LOG_FILE)
+    index_path = adi_index_path(ADIF_LOG_FILE)
+    indexed_end = None
+    if os.path.exists(index_path) and os.path.getsize(index_path) % ADIF_INDEX_RECORD.size == 0:
+        count = os.path.getsize(index_path) // ADIF_INDEX_RECORD.size
+        if count == 0:
+            indexed_end = size if size <= len(ADIF_LOG_HEADER.encode('utf-8')) else None
+        else:
+            with open(index_path, 'rb') as index_file:
+                _, offset, length = read_adi_index_entry(index_file, count - 1)
+            indexed_end = offset + length
+    if indexed_end != size:
+        rebuild_adi_index(ADIF_LOG_FILE)
+
+    first_day = None
+    with open(index_path, 'rb') as index_file:
+        if os.path.getsize(index_path) >= ADIF_INDEX_RECORD.size:
+            first_timestamp, _, _ = read_adi_index_entry(index_file, 0)
+            first_day = datet.fromtimestamp(first_timestamp, pytz.utc).date()
+    adif_log_state['size'] = size
+    adif_log_state['first_day'] = first_day
+
+    for file_path in list_adi_archives():
+        ensure_adi_index(file_path)
+
+def adi_index_valid(file_path):
+    """Check that a log has an index made of whole entries."""
+    index_path = adi_index_path(file_path)
+    return os.path.exists(index_path) and os.path.getsize(index_path) % ADIF_INDEX_RECORD.size == 0
+
+def ensure_adi_index(file_path):
+    """Rebuild the index of a log whose index is missing or truncated; return False if impossible."""
+    if adi_index_valid(file_path):
+        return True
+    try:
+        rebuild_adi_index(file_path)
+        return True
+    except (OSError, ValueError) as e:
+        debug_print(f"Skipping {file_path}, cannot rebuild its ADIF index: {str(e)}")
+        return False
+
+def rotate_adi_log():
+    """Move the active ADIF log and its index aside and start a fresh log."""
+    # Name the archive after the day it holds, not the moment it was rotated
+    suffix = adif_log_state['first_day'].strftime('%Y%m%d')
+    archive_path = os.path.join(ADIF_LOG_DIR, f"wsjtx_log_{suffix}.adi")
+    sequence = 1
+    while os.path.exists(archive_path):
+        archive_path = os.path.join(ADIF_LOG_DIR, f"wsjtx_log_{suffix}-{sequence}.adi")
+        sequence += 1
+    os.replace(adi_index_path(ADIF_LOG_FILE), adi_index_path(archive_path))
+    os.replace(ADIF_LOG_FILE, archive_path)
+    with open(ADIF_LOG_FILE, 'wb') as log_file:
+        log_file.write(ADIF_LOG_HEADER.encode('utf-8'))
+    open(adi_index_path(ADIF_LOG_FILE), 'wb').close()
+    adif_log_state['size'] = len(ADIF_LOG_HEADER.encode('utf-8'))
+    adif_log_state['first_day'] = None
+    debug_print(f"Rotated ADIF log to {archive_path}")
+
+def should_rotate_adi_log(entry, record_size):
+    """Decide whether the active ADIF log must be rotated before writing the entry."""
+    if adif_log_state['first_day'] is None:
+        return False
+    if ADIF_ROTATE == "day":
+        # A late decode from the previous day stays in the current log
+        return entry['humantime'].date() > adif_log_state['first_day']
+    if ADIF_ROTATE == "size":
+        return adif_log_state['size'] + record_size > ADIF_MAX_BYTES
+    return False
 
+def log_adi_entry(entry):
+    """Append WSJT-X compatible ADIF entry to log file and its sidecar index."""
     # Convert frequency and time formats
     band = frequency_to_band(entry['frequency'])
     freq_mhz = entry['frequency'] / 1000
@@ -506,13 +644,127 @@ def log_adi_entry(entry):
 <STATION_CALLSIGN:{len(STATION_CALLSIGN)}>{STATION_CALLSIGN}
 <MY_GRIDSQUARE:{len(MY_GRIDSQUARE)}>{MY_GRIDSQUARE}
 <COMMENT:{len(entry['distance'])}>Distance: {entry['distance']}
-<EOR>\n"""
+<EOR>\n""".encode('utf-8')
+
+    with adif_log_lock:
+        if not adif_log_state:
+            load_adi_log_state()
+        if should_rotate_adi_log(entry, len(adif_entry)):
+            rotate_adi_log()
+
+        # Append the record first, then index it, so the index never points past the data
+        offset = adif_log_state['size']
+        with open(ADIF_LOG_FILE, 'ab') as log_file:
+            log_file.write(adif_entry)
+        with open(adi_index_path(ADIF_LOG_FILE), 'ab') as index_file:
+            index_file.write(ADIF_INDEX_RECORD.pack(entry['timestamp'], offset, len(adif_entry)))
+
+        adif_log_state['size'] = offset + len(adif_entry)
+        if adif_log_state['first_day'] is None:
+            adif_log_state['first_day'] = entry['humantime'].date()
+
+def adi_log_order(file_path):
+    """Sort key for archived logs: first indexed timestamp, then last modification."""
+    first_timestamp = 0
+    index_path = adi_index_path(file_path)
+    if os.path.exists(index_path) and os.path.getsize(index_path) >= ADIF_INDEX_RECORD.size:
+        with open(index_path, 'rb') as index_file:
+            first_timestamp = read_adi_index_entry(index_file, 0)[0]
+    return first_timestamp, os.path.getmtime(file_path)
+
+def list_adi_archives():
+    """Return the archived ADIF log files, unordered."""
+    return [
+        os.path.join(ADIF_LOG_DIR, name) for name in os.listdir(ADIF_LOG_DIR)
+        if name.startswith('wsjtx_log_') and name.endswith('.adi')
+    ]
+
+def find_adi_index_position(index_file, count, timestamp):
+    """Binary search an open index for the first entry with time >= timestamp."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if read_adi_index_entry(index_file, middle)[0] < timestamp:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def find_adi_range(file_path, from_time, to_time):
+    """Locate the byte range of a log's records between from_time and to_time (inclusive)."""
+    index_path = adi_index_path(file_path)
+    with open(index_path, 'rb') as index_file:
+        count = os.path.getsize(index_path) // ADIF_INDEX_RECORD.size
+        if count == 0:
+            return None
+        if read_adi_index_entry(index_file, 0)[0] > to_time:
+            return None
+        if read_adi_index_entry(index_file, count - 1)[0] < from_time:
+            return None
+        first = find_adi_index_position(index_file, count, from_time)
+        last = find_adi_index_position(index_file, count, to_time + 1)
+        if first >= last:
+            return None
+        start = read_adi_index_entry(index_file, first)[1]
+        _, offset, length = read_adi_index_entry(index_file, last - 1)
+    return start, offset + length
+
+def find_adi_archive_ranges(archives, from_time, to_time):
+    """Locate the byte ranges of archived records in chronological order."""
+    # Archives never change after rotation, so this runs without adif_log_lock
+    archives = [file_path for file_path in archives if os.path.exists(file_path) and ensure_adi_index(file_path)]
+    # File names are not enough: a same-day rotation adds a "-N" suffix that sorts first
+    archives.sort(key=adi_log_order)
+    ranges = []
+    for file_path in archives:
+        found = find_adi_range(file_path, from_time, to_time)
+        if found:
+            ranges.append((file_path, found[0], found[1]))
+    return ranges
+
+def stream_adi_export(archives, active, from_time, to_time):
+    """Yield the ADIF header and the selected records chunk by chunk.
+
+    Archives are opened one at a time; the active log is passed as an already
+    open (file, start, end) snapshot, or None.
+    """
+    def copy_range(log_file, start, end):
+        log_file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = log_file.read(min(ADIF_EXPORT_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
 
-    # Append the record to the file
-    with open(file_path, 'a', encoding='utf-8') as log_file:
-        log_file.write(adif_entry)
-        
-        
+    try:
+        yield ADIF_LOG_HEADER.encode('utf-8')
+        for file_path, start, end in find_adi_archive_ranges(archives, from_time, to_time):
+            try:
+                log_file = open(file_path, 'rb')
+            except OSError as e:
+                debug_print(f"Skipping {file_path} in ADIF export: {str(e)}")
+                continue
+            with log_file:
+                yield from copy_range(log_file, start, end)
+        if active:
+            yield from copy_range(*active)
+    finally:
+        # Also close the active log when the client disconnects early
+        if active:
+            active[0].close()
+
+def parse_export_time(value, default):
+    """Parse an export bound given as unix seconds or ISO 8601 (UTC if no zone)."""
+    if not value:
+        return default
+    if value.lstrip('-').isdigit():
+        return int(value)
+    timestamp = datet.fromisoformat(value.replace('Z', '+00:00'))
+    if timestamp.tzinfo is None:
+        timestamp = pytz.utc.localize(timestamp)
+    return int(timestamp.timestamp())
 
 def udp_listener():
     """Listen for incoming UDP packets and process FT8 log data."""
@@ -555,6 +807,34 @@ def get_spots():
     } for spot in active_spots]
     return jsonify(spots)
 
+@app.route('/export.adi')
+def export_adi():
+    """Stream logged ADIF records between the 'from' and 'to' times."""
+    try:
+        from_time = parse_export_time(request.args.get('from'), 0)
+        to_time = parse_export_time(request.args.get('to'), int(time.time()))
+    except ValueError:
+        return jsonify({'error': "Invalid 'from' or 'to' (use unix seconds or ISO 8601)"}), 400
+
+    # Only read here: with ADIF logging off or no logs yet, export just the header
+    archives = []
+    active = None
+    if ADIF_LOGS != "No" and os.path.isdir(ADIF_LOG_DIR):
+        # Only the active log can be moved by a rotation: snapshot it together
+        # with the archive list under the lock, and leave the rest to the stream
+        with adif_log_lock:
+            archives = list_adi_archives()
+            if os.path.exists(ADIF_LOG_FILE) and adi_index_valid(ADIF_LOG_FILE):
+                found = find_adi_range(ADIF_LOG_FILE, from_time, to_time)
+                if found:
+                    active = (open(ADIF_LOG_FILE, 'rb'), found[0], found[1])
+
+    return Response(
+        stream_adi_export(archives, active, from_time, to_time),
+        mimetype='text/plain',
+        headers={'Content-Disposition': 'attachment; filename=wsjtx_export.adi'}
+    )
+
 @app.route('/worked_stats')
 def get_worked_statistics():
     """Get statistics about worked callsigns and countries."""
@@ -621,6 +901,12 @@ if __name__ == '__main__':
     cache_stats = get_cache_stats()
     print(f"Loaded callsign cache: {cache_entries} entries ({cache_stats['successful_lookups']} successful, {cache_stats['failed_lookups']} failed)")
     
+    # Check the ADIF logs and their indexes now, not on the first decode
+    if ADIF_LOGS != "No":
+        with adif_log_lock:
+            load_adi_log_state()
+        print(f"ADIF log ready: {ADIF_LOG_FILE} ({adif_log_state['size']} bytes, rotation: {ADIF_ROTATE})")
+
     # Start the UDP listener in a separate thread
     Thread(target=udp_listener, daemon=True).start()
     